@@ -1,35 +1,37 @@
 #!/usr/bin/env python3
 import argparse
 import json
+import itertools
 import os
+import re
+import shutil
+import stat
 import sys
 import time
-from typing import Any, Dict, List, Optional
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator, List, Optional
 
 import requests
 import csv
 import unicodedata
 
 
+# KEY=value lines, optionally prefixed with "export"; comment and blank lines never match
+_ENV_LINE_RE = re.compile(r'^[^\S\n]*(?:export[^\S\n]+)?([^#\s=][^=\n]*)=([^\n]*)$', re.M)
+
+
 def load_agents_env(path: Optional[str] = None) -> None:
     env_path = path or os.environ.get("AGENTS_ENV_PATH", os.path.expanduser("~/AGENTS.env"))
     if not os.path.exists(env_path):
         return
     with open(env_path, 'r', encoding='utf-8') as f:
-        for raw in f:
-            line = raw.strip()
-            if not line or line.startswith('#'):
-                continue
-            if line.startswith('export '):
-                line = line[len('export '):].lstrip()
-            if '=' not in line:
-                continue
-            k, v = line.split('=', 1)
-            k = k.strip().strip('"').strip("'")
-            v = v.strip().strip('"').strip("'")
-            os.environ[k] = v
+        text = f.read()
+    for k, v in _ENV_LINE_RE.findall(text):
+        os.environ[k.strip().strip('"').strip("'")] = v.strip().strip('"').strip("'")
 
 
+# Config is fixed once AGENTS.env is loaded; call get_cfg.cache_clear() if the environment changes
+@lru_cache(maxsize=1)
 def get_cfg() -> Dict[str, str]:
     shop = os.environ.get('SHOPIFY_SHOP')
     token = os.environ.get('SHOPIFY_ADMIN_TOKEN') or os.environ.get('SHOPIFY_ACCESS_TOKEN')
@@ -40,39 +42,148 @@ def get_cfg() -> Dict[str, str]:
     return {"shop": shop, "token": token, "version": version, "url": url}
 
 
-def graphql(query: str, variables: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+_SESSION: Optional[requests.Session] = None
+
+
+def get_session() -> requests.Session:
+    # One keep-alive session per process so paginated calls reuse the TLS connection
+    global _SESSION
+    if _SESSION is None:
+        cfg = get_cfg()
+        _SESSION = requests.Session()
+        _SESSION.headers.update({
+            'Content-Type': 'application/json',
+            'X-Shopify-Access-Token': cfg['token'],
+        })
+    return _SESSION
+
+
+# Shared encoder for pretty-printed command output (same bytes as json.dumps(obj, indent=2))
+_PRETTY_ENCODER = json.JSONEncoder(indent=2)
+
+
+def print_json(obj: Any) -> None:
+    print(_PRETTY_ENCODER.encode(obj))
+
+
+# Parsed files are shared between callers, so treat the result as read-only
+@lru_cache(maxsize=64)
+def read_json_file(path: str) -> Any:
+    # json.loads sniffs the encoding of raw bytes, so skip the text-mode decode
+    with open(path, 'rb') as f:
+        return json.loads(f.read())
+
+
+def load_json_arg(val: str) -> Any:
+    # Accept inline JSON or file path
+    p = os.path.expanduser(val)
+    if os.path.exists(p):
+        return read_json_file(p)
+    return json.loads(val)
+
+
+def read_text_file(path: str) -> str:
+    with open(os.path.expanduser(path), 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+GRAPHQL_THROTTLE_RETRIES = 5
+
+
+def throttle_delay(data: Dict[str, Any]) -> Optional[float]:
+    # Shopify reports cost throttling as HTTP 200 with a THROTTLED error; wait until the bucket refills
+    errors = data.get('errors') or []
+    if not any(isinstance(e, dict) and (e.get('extensions') or {}).get('code') == 'THROTTLED' for e in errors):
+        return None
+    cost = (data.get('extensions') or {}).get('cost') or {}
+    status = cost.get('throttleStatus') or {}
+    needed = (cost.get('requestedQueryCost') or 0) - (status.get('currentlyAvailable') or 0)
+    return max(needed / (status.get('restoreRate') or 50), 1.0)
+
+
+def graphql(query: str, variables: Optional[Dict[str, Any]] = None, raise_on_errors: bool = True) -> Dict[str, Any]:
     cfg = get_cfg()
-    headers = {
-        'Content-Type': 'application/json',
-        'X-Shopify-Access-Token': cfg['token'],
-    }
+    session = get_session()
     payload = {'query': query, 'variables': variables or {}}
     url = cfg['url']
-    r = requests.post(url, headers=headers, json=payload, timeout=60, allow_redirects=False)
-    # Handle Shopify 301/302 canonical redirect by re-POSTing to Location
-    if r.status_code in (301, 302, 303, 307, 308):
-        loc = r.headers.get('Location')
-        if loc:
-            url = loc
-            r = requests.post(url, headers=headers, json=payload, timeout=60, allow_redirects=False)
-    if r.status_code == 429:
-        time.sleep(2)
-        r = requests.post(url, headers=headers, json=payload, timeout=60, allow_redirects=False)
-    if not r.ok:
-        raise SystemExit(f"HTTP {r.status_code}: {r.text[:400]}")
-    data = r.json()
-    if 'errors' in data and data['errors']:
-        raise SystemExit(json.dumps(data['errors'], indent=2))
+    for attempt in range(GRAPHQL_THROTTLE_RETRIES + 1):
+        r = session.post(url, json=payload, timeout=60, allow_redirects=False)
+        # Handle Shopify 301/302 canonical redirect by re-POSTing to Location
+        if r.status_code in (301, 302, 303, 307, 308):
+            loc = r.headers.get('Location')
+            if loc:
+                url = loc
+                r = session.post(url, json=payload, timeout=60, allow_redirects=False)
+        if r.status_code == 429:
+            time.sleep(2)
+            r = session.post(url, json=payload, timeout=60, allow_redirects=False)
+        if not r.ok:
+            raise SystemExit(f"HTTP {r.status_code}: {r.text[:400]}")
+        # Parse the raw bytes; skips requests' text decoding and charset detection
+        data = json.loads(r.content)
+        delay = throttle_delay(data)
+        if delay is None or attempt == GRAPHQL_THROTTLE_RETRIES:
+            break
+        time.sleep(delay)
+    # Batched mutations pass raise_on_errors=False to read partial data alongside errors
+    if raise_on_errors and data.get('errors'):
+        raise SystemExit(_PRETTY_ENCODER.encode(data['errors']))
     return data
 
 
+def run_bulk_query(query: str, poll_interval: float = 1.0, max_interval: float = 10.0) -> Iterator[Dict[str, Any]]:
+    mutation = """
+    mutation($q: String!) {
+      bulkOperationRunQuery(query: $q) {
+        bulkOperation { id status }
+        userErrors { field message }
+      }
+    }
+    """
+    data = graphql(mutation, {"q": query}).get('data', {})
+    payload = data.get('bulkOperationRunQuery') or {}
+    errs = payload.get('userErrors') or []
+    if errs:
+        raise SystemExit(_PRETTY_ENCODER.encode(errs))
+    op_id = (payload.get('bulkOperation') or {}).get('id')
+    poll = """
+    query($id: ID!) {
+      node(id: $id) { ... on BulkOperation { id status errorCode objectCount url } }
+    }
+    """
+    delay = poll_interval
+    while True:
+        op = graphql(poll, {"id": op_id}).get('data', {}).get('node') or {}
+        status = op.get('status')
+        if status == 'COMPLETED':
+            break
+        if status in ('FAILED', 'CANCELED', 'EXPIRED'):
+            raise SystemExit(f"Bulk operation {status}: {op.get('errorCode')}")
+        time.sleep(delay)
+        delay = min(delay * 2, max_interval)
+    # No url means the query matched nothing; the signed download URL must not get our token
+    url = op.get('url')
+    if not url:
+        return iter(())
+    r = requests.get(url, stream=True, timeout=60)
+    if not r.ok:
+        raise SystemExit(f"HTTP {r.status_code} downloading bulk results")
+    # Parse rows lazily as the file downloads; the export can be far larger than memory allows
+    return (json.loads(line) for line in r.iter_lines() if line)
+
+
+def bulk_connection_query(conn: str, node_fields: str, query: Optional[str]) -> str:
+    query_part = f'(query: {json.dumps(query)})' if query else ''
+    return f"{{ {conn}{query_part} {{ edges {{ node {{ {node_fields} }} }} }} }}"
+
+
 def cmd_auth(args) -> int:
     load_agents_env(args.env)
     q = """
     query { shop { name myshopifyDomain } }
     """
     resp = graphql(q)
-    print(json.dumps(resp.get('data', {}), indent=2))
+    print_json(resp.get('data', {}))
     return 0
 
 
@@ -80,42 +191,97 @@ def cmd_query(args) -> int:
     load_agents_env(args.env)
     if not args.file and not args.query:
         raise SystemExit('--file or --query is required')
-    q = args.query or open(os.path.expanduser(args.file), 'r', encoding='utf-8').read()
+    q = args.query or read_text_file(args.file)
     vars_obj = {}
     if args.variables:
-        vpath = os.path.expanduser(args.variables)
-        if os.path.exists(vpath):
-            vars_obj = json.load(open(vpath, 'r', encoding='utf-8'))
-        else:
-            vars_obj = json.loads(args.variables)
+        vars_obj = load_json_arg(args.variables)
     resp = graphql(q, vars_obj)
-    print(json.dumps(resp.get('data', {}), indent=2))
+    print_json(resp.get('data', {}))
     return 0
 
 
-def write_jsonl(items: List[Dict[str, Any]], out: Optional[str]) -> None:
-    if out:
-        outp = os.path.expanduser(out)
-        os.makedirs(os.path.dirname(outp) or '.', exist_ok=True)
-        with open(outp, 'w', encoding='utf-8') as f:
-            for it in items:
-                f.write(json.dumps(it, ensure_ascii=False) + '\n')
-        print(json.dumps({'ok': True, 'count': len(items), 'out': outp}, indent=2))
-    else:
-        for it in items:
-            sys.stdout.write(json.dumps(it, ensure_ascii=False) + '\n')
+# json.dumps() with non-default options builds a new encoder per call; reuse one for JSONL rows
+_JSONL_ENCODE = json.JSONEncoder(ensure_ascii=False).encode
 
 
-def write_csv(items: List[Dict[str, Any]], fields: List[str], out: str) -> None:
+@lru_cache(maxsize=64)
+def _output_path(out: str) -> str:
+    # Expand ~ and create the parent directory once per distinct output path
     outp = os.path.expanduser(out)
     os.makedirs(os.path.dirname(outp) or '.', exist_ok=True)
-    with open(outp, 'w', encoding='utf-8', newline='') as f:
-        w = csv.DictWriter(f, fieldnames=fields)
-        w.writeheader()
-        for it in items:
-            row = {k: it.get(k) for k in fields}
-            w.writerow(row)
-    print(json.dumps({'ok': True, 'count': len(items), 'csv': outp}, indent=2))
+    return outp
+
+
+_NO_ROWS = object()
+
+
+def _prefetch_first(items: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    # Pull the first row (and so the first GraphQL page) before touching the output path,
+    # so a failed first request never creates directories or truncates a previous export
+    it = iter(items)
+    first = next(it, _NO_ROWS)
+    return it if first is _NO_ROWS else itertools.chain((first,), it)
+
+
+def _write_output(outp: str, write_rows, newline: Optional[str] = None) -> None:
+    # A new path or regular file is written beside its real location and swapped in only once
+    # every page is written, so a failed export leaves the previous file (and its mode) intact.
+    # Anything else (/dev/stdout, a FIFO, a device) is written in place; a rename would replace it.
+    try:
+        st = os.stat(outp)
+    except FileNotFoundError:
+        st = None
+    if st is not None and not stat.S_ISREG(st.st_mode):
+        with open(outp, 'w', encoding='utf-8', newline=newline) as f:
+            write_rows(f)
+        return
+    real = os.path.realpath(outp)
+    tmp = f'{real}.{os.getpid()}.tmp'
+    try:
+        with open(tmp, 'w', encoding='utf-8', newline=newline) as f:
+            write_rows(f)
+        if st is not None:
+            shutil.copymode(real, tmp)
+        os.replace(tmp, real)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def write_jsonl(items: Iterable[Dict[str, Any]], out: Optional[str]) -> None:
+    if not out:
+        sys.stdout.writelines(_JSONL_ENCODE(it) + '\n' for it in items)
+        return
+    rows = _prefetch_first(items)
+    outp = _output_path(out)
+    count = 0
+
+    def write_rows(f) -> None:
+        nonlocal count
+        for it in rows:
+            f.write(_JSONL_ENCODE(it) + '\n')
+            count += 1
+
+    _write_output(outp, write_rows)
+    print_json({'ok': True, 'count': count, 'out': outp})
+
+
+def write_csv(items: Iterable[Dict[str, Any]], fields: List[str], out: str) -> None:
+    rows = _prefetch_first(items)
+    outp = _output_path(out)
+    count = 0
+
+    def write_rows(f) -> None:
+        nonlocal count
+        w = csv.writer(f)
+        w.writerow(fields)
+        for it in rows:
+            # map(it.get, ...) builds the row in C; csv.writer accepts any iterable row
+            w.writerow(map(it.get, fields))
+            count += 1
+
+    _write_output(outp, write_rows, newline='')
+    print_json({'ok': True, 'count': count, 'csv': outp})
 
 
 def paginate_connection(conn: Dict[str, Any], node_key: str) -> List[Dict[str, Any]]:
@@ -127,70 +293,75 @@ def paginate_connection(conn: Dict[str, Any], node_key: str) -> List[Dict[str, A
     return out
 
 
-def slugify_handle(s: str) -> str:
+def iter_connection_nodes(query: str, conn_key: str, page_size: int, search: Optional[str] = None,
+                          limit: Optional[int] = None,
+                          variables: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+    # Yields nodes page by page so callers can write each page before the next request.
+    # conn_key may be dotted for nested connections, e.g. 'blog.articles'.
+    after = None
+    fetched = 0
+    while True:
+        page_vars = page_variables(after, search, page_size)
+        if variables:
+            page_vars.update(variables)
+        conn = graphql(query, page_vars).get('data', {})
+        for key in conn_key.split('.'):
+            conn = conn.get(key) or {}
+        nodes = paginate_connection(conn, conn_key)
+        yield from nodes
+        fetched += len(nodes)
+        if (not conn.get('pageInfo', {}).get('hasNextPage')) or (limit is not None and fetched >= limit):
+            break
+        after = conn.get('pageInfo', {}).get('endCursor')
+        if not after:
+            break
+
+
+def _strip_accents(s: str) -> str:
+    # ASCII text is unchanged by NFKD and has no combining marks
+    if s.isascii():
+        return s
     s_norm = unicodedata.normalize('NFKD', s)
-    s_ascii = ''.join(c for c in s_norm if not unicodedata.combining(c))
-    out = []
-    prev_dash = False
-    for ch in s_ascii.lower():
-        if ch.isalnum():
-            out.append(ch)
-            prev_dash = False
-        else:
-            if not prev_dash:
-                out.append('-')
-                prev_dash = True
-    handle = ''.join(out).strip('-')
-    while '--' in handle:
-        handle = handle.replace('--', '-')
-    return handle
+    return ''.join(c for c in s_norm if not unicodedata.combining(c))
 
 
+# Matches exactly the characters str.isalnum() rejects (\w is alnum plus underscore)
+_NON_ALNUM_RE = re.compile(r'[\W_]')
+_DASH_RUN_RE = re.compile(r'-+')
+
+
+@lru_cache(maxsize=4096)
+def slugify_handle(s: str) -> str:
+    s_ascii = _strip_accents(s)
+    handle = _NON_ALNUM_RE.sub('-', s_ascii.lower())
+    return _DASH_RUN_RE.sub('-', handle).strip('-')
+
+
+@lru_cache(maxsize=4096)
 def normalize_name(s: str) -> str:
-    s_norm = unicodedata.normalize('NFKD', s)
-    s_ascii = ''.join(c for c in s_norm if not unicodedata.combining(c))
+    s_ascii = _strip_accents(s)
     return ' '.join(''.join(ch.lower() if ch.isalnum() else ' ' for ch in s_ascii).split())
 
 
+# Placeholder vendor values that never get their own collection (compared lowercased)
+_VENDOR_BLOCKLIST = frozenset({'unknown', 'misc', 'various', 'n/a', 'na', '-', 'untagged'})
+
+
 def collect_distinct_vendors(page_size: int = 200) -> List[str]:
     items: List[str] = []
     seen = set()
-    after = None
-    while True:
-        q = products_query(after, None, page_size)
-        data = graphql(q).get('data', {})
-        conn = data.get('products') or {}
-        edges = (conn or {}).get('edges', [])
-        for e in edges:
-            node = e.get('node') or {}
-            v = (node.get('vendor') or '').strip()
-            if v and v.lower() not in ('unknown','misc','various','n/a','na','-','untagged'):
-                if v not in seen:
-                    seen.add(v)
-                    items.append(v)
-        if not conn.get('pageInfo', {}).get('hasNextPage'):
-            break
-        after = conn.get('pageInfo', {}).get('endCursor')
-        if not after:
-            break
+    for node in iter_connection_nodes(PRODUCTS_QUERY, 'products', page_size):
+        v = (node.get('vendor') or '').strip()
+        if v and v.lower() not in _VENDOR_BLOCKLIST:
+            if v not in seen:
+                seen.add(v)
+                items.append(v)
     items.sort()
     return items
 
 
 def fetch_all_collections(page_size: int = 200) -> List[Dict[str, Any]]:
-    out: List[Dict[str, Any]] = []
-    after = None
-    while True:
-        q = collections_query(after, None, page_size)
-        data = graphql(q).get('data', {})
-        conn = data.get('collections') or {}
-        out.extend(paginate_connection(conn, 'collections'))
-        if not conn.get('pageInfo', {}).get('hasNextPage'):
-            break
-        after = conn.get('pageInfo', {}).get('endCursor')
-        if not after:
-            break
-    return out
+    return list(iter_connection_nodes(COLLECTIONS_QUERY, 'collections', page_size))
 
 
 def build_vendor_ruleset(vendor: str) -> Dict[str, Any]:
@@ -202,11 +373,24 @@ def build_vendor_ruleset(vendor: str) -> Dict[str, Any]:
     }
 
 
+# 25 collectionCreate fields stay well under Shopify's 1000-point single-query cost limit
+COLLECTION_CREATE_BATCH_SIZE = 25
+
+
+def collection_create_batch_mutation(n: int) -> str:
+    params = ', '.join(f'$i{i}: CollectionInput!' for i in range(n))
+    fields = '\n'.join(
+        f'  c{i}: collectionCreate(input: $i{i}) {{ collection {{ id handle title }} userErrors {{ field message }} }}'
+        for i in range(n)
+    )
+    return f"mutation({params}) {{\n{fields}\n}}"
+
+
 def cmd_vendors_list(args) -> int:
     load_agents_env(args.env)
     vendors = collect_distinct_vendors()
-    if getattr(args, 'json', False):
-        print(json.dumps({"count": len(vendors), "vendors": vendors}, indent=2))
+    if args.json:
+        print_json({"count": len(vendors), "vendors": vendors})
     else:
         for v in vendors:
             print(v)
@@ -225,11 +409,13 @@ def cmd_vendors_ensure_collections(args) -> int:
             x = x.strip()
             if x:
                 exclude.add(normalize_name(x))
-    vendors = [v for v in vendors if normalize_name(v) not in exclude]
+    # vendors are distinct, so normalize each exactly once and reuse below
+    normalized = {v: normalize_name(v) for v in vendors}
+    vendors = [v for v in vendors if normalized[v] not in exclude]
 
     # renames mapping: support multiple --rename values formatted as "old=new"
     rename_map: Dict[str, str] = {}
-    for spec in getattr(args, 'rename', []) or []:
+    for spec in args.rename or []:
         if '=' in spec:
             old, new = spec.split('=', 1)
             old = old.strip(); new = new.strip()
@@ -237,12 +423,12 @@ def cmd_vendors_ensure_collections(args) -> int:
                 rename_map[normalize_name(old)] = new
 
     colls = fetch_all_collections()
-    existing_handles = set((c.get('handle') or '').lower() for c in colls if c.get('handle'))
+    existing_handles = frozenset(c['handle'].lower() for c in colls if c.get('handle'))
+    titles = [rename_map.get(normalized[v], v) for v in vendors]
+    handles = list(map(slugify_handle, titles))
     plan: List[Dict[str, Any]] = []
     planned_by_handle: Dict[str, Dict[str, Any]] = {}
-    for v in vendors:
-        title = rename_map.get(normalize_name(v), v)
-        handle = slugify_handle(title)
+    for v, title, handle in zip(vendors, titles, handles):
         if handle in existing_handles:
             continue
         rule = {"column": "VENDOR", "relation": "EQUALS", "condition": v}
@@ -263,32 +449,42 @@ def cmd_vendors_ensure_collections(args) -> int:
             planned_by_handle[handle] = item
             plan.append(item)
     summary = {"vendors": len(vendors), "existing_collections": len(colls), "to_create": len(plan)}
-    if not getattr(args, 'apply', False):
-        if getattr(args, 'full', False):
+    if not args.apply:
+        if args.full:
             out = {"summary": summary, "plan": plan}
         else:
             out = {"summary": summary, "examples": plan[: min(5, len(plan))]}
-        print(json.dumps(out, indent=2))
+        print_json(out)
         return 0
-    # Apply
-    mutation = """
-    mutation($input: CollectionInput!) {
-      collectionCreate(input: $input) { collection { id handle title } userErrors { field message } }
-    }
-    """
+    # Apply in batches: one request carries several aliased collectionCreate mutations
     created = []
-    for item in plan:
-        variables = {"input": item}
-        data = graphql(mutation, variables).get('data', {})
-        payload = data.get('collectionCreate') or {}
-        errs = payload.get('userErrors') or []
-        if errs:
-            print(json.dumps({"error": errs, "input": item}, indent=2))
-        else:
-            created.append(payload.get('collection'))
-            print(json.dumps(payload.get('collection'), indent=2))
-    print(json.dumps({"summary": summary, "created": len(created)}, indent=2))
-    return 0
+    request_errors = False
+    for start in range(0, len(plan), args.batch_size):
+        chunk = plan[start:start + args.batch_size]
+        variables = {f"i{i}": item for i, item in enumerate(chunk)}
+        # A resolver error on one alias must not hide what the other aliases already created
+        resp = graphql(collection_create_batch_mutation(len(chunk)), variables, raise_on_errors=False)
+        if resp.get('errors'):
+            request_errors = True
+            print_json({"errors": resp['errors']})
+        data = resp.get('data') or {}
+        for i, item in enumerate(chunk):
+            payload = data.get(f'c{i}') or {}
+            errs = payload.get('userErrors') or []
+            collection = payload.get('collection')
+            if errs:
+                print_json({"error": errs, "input": item})
+            elif not collection:
+                print_json({"error": "no result (see errors above)", "input": item})
+            else:
+                created.append(collection)
+                print_json(collection)
+    print_json({"summary": summary, "created": len(created)})
+    return 1 if request_errors else 0
+
+
+# Handle -> id lookups are stable within a process; long-running callers can cache_clear()
+@lru_cache(maxsize=256)
 def resolve_blog_id_by_handle(handle: str) -> Optional[str]:
     q = f"""
     query {{
@@ -300,6 +496,7 @@ def resolve_blog_id_by_handle(handle: str) -> Optional[str]:
     return edges[0]['node']['id'] if edges else None
 
 
+@lru_cache(maxsize=256)
 def resolve_collection_id_by_handle(handle: str) -> Optional[str]:
     q = f"""
     query {{
@@ -335,283 +532,153 @@ def resolve_article_id(blog_id: Optional[str], handle: Optional[str]) -> Optiona
     return edges[0].get('node', {}).get('id')
 
 
-def products_query(after: Optional[str], query: Optional[str], page_size: int) -> str:
-    after_part = f', after: "{after}"' if after else ''
-    query_part = f', query: {json.dumps(query)}' if query else ''
-    return f"""
-    query {{
-      products(first: {page_size}{after_part}{query_part}) {{
-        edges {{
-          cursor
-          node {{
-            id title handle vendor productType createdAt updatedAt
-          }}
-        }}
-        pageInfo {{ hasNextPage endCursor }}
-      }}
-    }}
-    """
-
-
-def customers_query(after: Optional[str], query: Optional[str], page_size: int) -> str:
-    after_part = f', after: "{after}"' if after else ''
-    query_part = f', query: {json.dumps(query)}' if query else ''
-    return f"""
-    query {{
-      customers(first: {page_size}{after_part}{query_part}) {{
-        edges {{ cursor node {{ id displayName email tags state createdAt updatedAt }} }}
-        pageInfo {{ hasNextPage endCursor }}
-      }}
-    }}
-    """
-
-
-def orders_query(after: Optional[str], query: Optional[str], page_size: int) -> str:
-    after_part = f', after: "{after}"' if after else ''
-    query_part = f', query: {json.dumps(query)}' if query else ''
-    return f"""
-    query {{
-      orders(first: {page_size}{after_part}{query_part}) {{
-        edges {{ cursor node {{ id name tags financialStatus fulfillmentStatus createdAt updatedAt }} }}
-        pageInfo {{ hasNextPage endCursor }}
-      }}
-    }}
-    """
+PRODUCT_FIELDS = 'id title handle vendor productType createdAt updatedAt'
+CUSTOMER_FIELDS = 'id displayName email tags state createdAt updatedAt'
+ORDER_FIELDS = 'id name tags financialStatus fulfillmentStatus createdAt updatedAt'
 
 
-def pages_query(after: Optional[str], query: Optional[str], page_size: int) -> str:
-    after_part = f', after: "{after}"' if after else ''
-    query_part = f', query: {json.dumps(query)}' if query else ''
-    return f"""
-    query {{
-      pages(first: {page_size}{after_part}{query_part}) {{
-        edges {{ cursor node {{ id title handle templateSuffix createdAt updatedAt }} }}
-        pageInfo {{ hasNextPage endCursor }}
-      }}
-    }}
-    """
+def page_variables(after: Optional[str], query: Optional[str], page_size: int) -> Dict[str, Any]:
+    return {"first": page_size, "after": after, "query": query}
 
 
-def blogs_query(after: Optional[str], query: Optional[str], page_size: int) -> str:
-    after_part = f', after: "{after}"' if after else ''
-    query_part = f', query: {json.dumps(query)}' if query else ''
-    return f"""
-    query {{
-      blogs(first: {page_size}{after_part}{query_part}) {{
-        edges {{ cursor node {{ id title handle createdAt updatedAt }} }}
-        pageInfo {{ hasNextPage endCursor }}
+# Query text stays byte-identical across pages; cursor/search/page size travel as variables
+PRODUCTS_QUERY = f"""
+query($first: Int!, $after: String, $query: String) {{
+  products(first: $first, after: $after, query: $query) {{
+    edges {{
+      cursor
+      node {{
+        {PRODUCT_FIELDS}
       }}
     }}
-    """
-
-
-def articles_query(after: Optional[str], query: Optional[str], page_size: int, blog_id: Optional[str]) -> str:
-    after_part = f', after: "{after}"' if after else ''
-    query_part = f', query: {json.dumps(query)}' if query else ''
-    if blog_id:
-        # Articles scoped to a blog
-        return f"""
-        query($id: ID!) {{
-          blog(id: $id) {{
-            id
-            articles(first: {page_size}{after_part}{query_part}) {{
-              edges {{ cursor node {{ id title handle author {{ name }} publishedAt updatedAt }} }}
-              pageInfo {{ hasNextPage endCursor }}
-            }}
-          }}
-        }}
-        """
+    pageInfo {{ hasNextPage endCursor }}
+  }}
+}}
+"""
+
+CUSTOMERS_QUERY = f"""
+query($first: Int!, $after: String, $query: String) {{
+  customers(first: $first, after: $after, query: $query) {{
+    edges {{ cursor node {{ {CUSTOMER_FIELDS} }} }}
+    pageInfo {{ hasNextPage endCursor }}
+  }}
+}}
+"""
+
+ORDERS_QUERY = f"""
+query($first: Int!, $after: String, $query: String) {{
+  orders(first: $first, after: $after, query: $query) {{
+    edges {{ cursor node {{ {ORDER_FIELDS} }} }}
+    pageInfo {{ hasNextPage endCursor }}
+  }}
+}}
+"""
+
+PAGES_QUERY = """
+query($first: Int!, $after: String, $query: String) {
+  pages(first: $first, after: $after, query: $query) {
+    edges { cursor node { id title handle templateSuffix createdAt updatedAt } }
+    pageInfo { hasNextPage endCursor }
+  }
+}
+"""
+
+BLOGS_QUERY = """
+query($first: Int!, $after: String, $query: String) {
+  blogs(first: $first, after: $after, query: $query) {
+    edges { cursor node { id title handle createdAt updatedAt } }
+    pageInfo { hasNextPage endCursor }
+  }
+}
+"""
+
+# Articles scoped to a blog
+BLOG_ARTICLES_QUERY = """
+query($id: ID!, $first: Int!, $after: String, $query: String) {
+  blog(id: $id) {
+    id
+    articles(first: $first, after: $after, query: $query) {
+      edges { cursor node { id title handle author { name } publishedAt updatedAt } }
+      pageInfo { hasNextPage endCursor }
+    }
+  }
+}
+"""
+
+# Global articles search
+ARTICLES_QUERY = """
+query($first: Int!, $after: String, $query: String) {
+  articles(first: $first, after: $after, query: $query) {
+    edges { cursor node { id title handle author { name } publishedAt updatedAt blog { id handle title } } }
+    pageInfo { hasNextPage endCursor }
+  }
+}
+"""
+
+COLLECTIONS_QUERY = """
+query($first: Int!, $after: String, $query: String) {
+  collections(first: $first, after: $after, query: $query) {
+    edges { cursor node { id title handle sortOrder templateSuffix updatedAt ruleSet { appliedDisjunctively } } }
+    pageInfo { hasNextPage endCursor }
+  }
+}
+"""
+
+
+def _paginate_list(query: str, conn_key: str, args, default_fields: Optional[str] = None,
+                   bulk_fields: Optional[str] = None, variables: Optional[Dict[str, Any]] = None) -> int:
+    # Shared body of the `<resource> list` commands: fetch (paged or bulk), then write JSONL/CSV
+    if bulk_fields and args.bulk:
+        items: Iterable[Dict[str, Any]] = run_bulk_query(bulk_connection_query(conn_key, bulk_fields, args.query))
     else:
-        # Global articles search
-        return f"""
-        query {{
-          articles(first: {page_size}{after_part}{query_part}) {{
-            edges {{ cursor node {{ id title handle author {{ name }} publishedAt updatedAt blog {{ id handle title }} }} }}
-            pageInfo {{ hasNextPage endCursor }}
-          }}
-        }}
-        """
-
-
-def collections_query(after: Optional[str], query: Optional[str], page_size: int) -> str:
-    after_part = f', after: "{after}"' if after else ''
-    query_part = f', query: {json.dumps(query)}' if query else ''
-    return f"""
-    query {{
-      collections(first: {page_size}{after_part}{query_part}) {{
-        edges {{ cursor node {{ id title handle sortOrder templateSuffix updatedAt ruleSet {{ appliedDisjunctively }} }} }}
-        pageInfo {{ hasNextPage endCursor }}
-      }}
-    }}
-    """
+        items = iter_connection_nodes(query, conn_key, int(args.page_size), args.query,
+                                      None if args.all else int(args.limit), variables)
+    fields = args.fields or default_fields
+    if args.csv and fields:
+        write_csv(items, [f.strip() for f in fields.split(',') if f.strip()], args.csv)
+    else:
+        write_jsonl(items, args.jsonl)
+    return 0
 
 
 def cmd_products_list(args) -> int:
     load_agents_env(args.env)
-    items: List[Dict[str, Any]] = []
-    after = None
-    fetched = 0
-    while True:
-        q = products_query(after, args.query, int(args.page_size))
-        data = graphql(q).get('data', {})
-        conn = data.get('products') or {}
-        nodes = paginate_connection(conn, 'products')
-        items.extend(nodes)
-        fetched += len(nodes)
-        if (not conn.get('pageInfo', {}).get('hasNextPage')) or (not args.all and fetched >= int(args.limit)):
-            break
-        after = conn.get('pageInfo', {}).get('endCursor')
-        if not after:
-            break
-    if args.csv:
-        fields = [s.strip() for s in (args.fields or 'id,title,handle,vendor,productType,createdAt').split(',') if s.strip()]
-        write_csv(items, fields, args.csv)
-    else:
-        write_jsonl(items, args.jsonl)
-    return 0
+    return _paginate_list(PRODUCTS_QUERY, 'products', args, 'id,title,handle,vendor,productType,createdAt',
+                          bulk_fields=PRODUCT_FIELDS)
 
 
 def cmd_pages_list(args) -> int:
     load_agents_env(args.env)
-    items: List[Dict[str, Any]] = []
-    after = None
-    fetched = 0
-    while True:
-        q = pages_query(after, args.query, int(args.page_size))
-        data = graphql(q).get('data', {})
-        conn = data.get('pages') or {}
-        nodes = paginate_connection(conn, 'pages')
-        items.extend(nodes)
-        fetched += len(nodes)
-        if (not conn.get('pageInfo', {}).get('hasNextPage')) or (not args.all and fetched >= int(args.limit)):
-            break
-        after = conn.get('pageInfo', {}).get('endCursor')
-    if args.csv and args.fields:
-        write_csv(items, [f.strip() for f in args.fields.split(',')], args.csv)
-    else:
-        write_jsonl(items, args.jsonl)
-    return 0
+    return _paginate_list(PAGES_QUERY, 'pages', args)
 
 
 def cmd_blogs_list(args) -> int:
     load_agents_env(args.env)
-    items: List[Dict[str, Any]] = []
-    after = None
-    fetched = 0
-    while True:
-        q = blogs_query(after, args.query, int(args.page_size))
-        data = graphql(q).get('data', {})
-        conn = data.get('blogs') or {}
-        nodes = paginate_connection(conn, 'blogs')
-        items.extend(nodes)
-        fetched += len(nodes)
-        if (not conn.get('pageInfo', {}).get('hasNextPage')) or (not args.all and fetched >= int(args.limit)):
-            break
-        after = conn.get('pageInfo', {}).get('endCursor')
-    if args.csv and args.fields:
-        write_csv(items, [f.strip() for f in args.fields.split(',')], args.csv)
-    else:
-        write_jsonl(items, args.jsonl)
-    return 0
+    return _paginate_list(BLOGS_QUERY, 'blogs', args)
 
 
 def cmd_articles_list(args) -> int:
     load_agents_env(args.env)
-    items: List[Dict[str, Any]] = []
-    after = None
-    fetched = 0
-    blog_id = args.blog_id
-    while True:
-        q = articles_query(after, args.query, int(args.page_size), blog_id)
-        variables = {"id": blog_id} if blog_id else None
-        data = graphql(q, variables).get('data', {})
-        if blog_id:
-            conn = (data.get('blog') or {}).get('articles') or {}
-        else:
-            conn = data.get('articles') or {}
-        nodes = paginate_connection(conn, 'articles')
-        items.extend(nodes)
-        fetched += len(nodes)
-        if (not conn.get('pageInfo', {}).get('hasNextPage')) or (not args.all and fetched >= int(args.limit)):
-            break
-        after = conn.get('pageInfo', {}).get('endCursor')
-    if args.csv and args.fields:
-        write_csv(items, [f.strip() for f in args.fields.split(',')], args.csv)
-    else:
-        write_jsonl(items, args.jsonl)
-    return 0
+    if args.blog_id:
+        return _paginate_list(BLOG_ARTICLES_QUERY, 'blog.articles', args, variables={"id": args.blog_id})
+    return _paginate_list(ARTICLES_QUERY, 'articles', args)
 
 
 def cmd_collections_list(args) -> int:
     load_agents_env(args.env)
-    items: List[Dict[str, Any]] = []
-    after = None
-    fetched = 0
-    while True:
-        q = collections_query(after, args.query, int(args.page_size))
-        data = graphql(q).get('data', {})
-        conn = data.get('collections') or {}
-        nodes = paginate_connection(conn, 'collections')
-        items.extend(nodes)
-        fetched += len(nodes)
-        if (not conn.get('pageInfo', {}).get('hasNextPage')) or (not args.all and fetched >= int(args.limit)):
-            break
-        after = conn.get('pageInfo', {}).get('endCursor')
-    if args.csv and args.fields:
-        write_csv(items, [f.strip() for f in args.fields.split(',')], args.csv)
-    else:
-        write_jsonl(items, args.jsonl)
-    return 0
+    return _paginate_list(COLLECTIONS_QUERY, 'collections', args)
 
 
 def cmd_customers_list(args) -> int:
     load_agents_env(args.env)
-    items: List[Dict[str, Any]] = []
-    after = None
-    fetched = 0
-    while True:
-        q = customers_query(after, args.query, int(args.page_size))
-        data = graphql(q).get('data', {})
-        conn = data.get('customers') or {}
-        nodes = paginate_connection(conn, 'customers')
-        items.extend(nodes)
-        fetched += len(nodes)
-        if (not conn.get('pageInfo', {}).get('hasNextPage')) or (not args.all and fetched >= int(args.limit)):
-            break
-        after = conn.get('pageInfo', {}).get('endCursor')
-        if not after:
-            break
-    if args.csv:
-        fields = [s.strip() for s in (args.fields or 'id,displayName,email,tags,state,createdAt').split(',') if s.strip()]
-        write_csv(items, fields, args.csv)
-    else:
-        write_jsonl(items, args.jsonl)
-    return 0
+    return _paginate_list(CUSTOMERS_QUERY, 'customers', args, 'id,displayName,email,tags,state,createdAt',
+                          bulk_fields=CUSTOMER_FIELDS)
 
 
 def cmd_orders_list(args) -> int:
     load_agents_env(args.env)
-    items: List[Dict[str, Any]] = []
-    after = None
-    fetched = 0
-    while True:
-        q = orders_query(after, args.query, int(args.page_size))
-        data = graphql(q).get('data', {})
-        conn = data.get('orders') or {}
-        nodes = paginate_connection(conn, 'orders')
-        items.extend(nodes)
-        fetched += len(nodes)
-        if (not conn.get('pageInfo', {}).get('hasNextPage')) or (not args.all and fetched >= int(args.limit)):
-            break
-        after = conn.get('pageInfo', {}).get('endCursor')
-        if not after:
-            break
-    if args.csv:
-        fields = [s.strip() for s in (args.fields or 'id,name,tags,financialStatus,fulfillmentStatus,createdAt').split(',') if s.strip()]
-        write_csv(items, fields, args.csv)
-    else:
-        write_jsonl(items, args.jsonl)
-    return 0
+    return _paginate_list(ORDERS_QUERY, 'orders', args, 'id,name,tags,financialStatus,fulfillmentStatus,createdAt',
+                          bulk_fields=ORDER_FIELDS)
 
 
 def cmd_metafield_get(args) -> int:
@@ -622,20 +689,22 @@ def cmd_metafield_get(args) -> int:
     }
     """
     data = graphql(q, {"ownerId": args.owner_id, "ns": args.ns, "key": args.key}).get('data', {})
-    print(json.dumps(data, indent=2))
+    print_json(data)
     return 0
 
 
+METAFIELDS_SET_MUTATION = """
+mutation($mf: [MetafieldsSetInput!]!) {
+  metafieldsSet(metafields: $mf) {
+    metafields { id namespace key type value }
+    userErrors { field message }
+  }
+}
+"""
+
+
 def cmd_metafield_set(args) -> int:
     load_agents_env(args.env)
-    mutation = """
-    mutation($mf: [MetafieldsSetInput!]!) {
-      metafieldsSet(metafields: $mf) {
-        metafields { id namespace key type value }
-        userErrors { field message }
-      }
-    }
-    """
     mf = [{
         "ownerId": args.owner_id,
         "namespace": args.ns,
@@ -644,45 +713,60 @@ def cmd_metafield_set(args) -> int:
         "value": args.value,
     }]
     if args.dry_run:
-        print(json.dumps({"dry_run": True, "mutation": mutation, "variables": {"mf": mf}}, indent=2))
+        print_json({"dry_run": True, "mutation": METAFIELDS_SET_MUTATION, "variables": {"mf": mf}})
         return 0
-    data = graphql(mutation, {"mf": mf}).get('data', {})
-    print(json.dumps(data, indent=2))
+    data = graphql(METAFIELDS_SET_MUTATION, {"mf": mf}).get('data', {})
+    print_json(data)
     return 0
 
 
+ORDER_FOS_BY_NAME_QUERY = """
+query($q: String!) {
+  orders(first: 1, query: $q) {
+    edges { node { id name fulfillmentOrders(first: 50) { edges { node { id status requestStatus } } } } }
+  }
+}
+"""
+
+ORDER_FOS_BY_ID_QUERY = """
+query($id: ID!) {
+  order(id: $id) { id name fulfillmentOrders(first: 50) { edges { node { id status requestStatus } } } }
+}
+"""
+
+
+def fetch_order_fulfillment_orders(order_id: Optional[str], order_name: Optional[str]) -> Optional[Dict[str, Any]]:
+    # Order node with its fulfillmentOrders; None when no order matches the name
+    if order_name:
+        data = graphql(ORDER_FOS_BY_NAME_QUERY, {"q": 'name:' + order_name}).get('data', {})
+        edges = (((data.get('orders') or {}).get('edges')) or [])
+        return edges[0]['node'] if edges else None
+    data = graphql(ORDER_FOS_BY_ID_QUERY, {"id": order_id}).get('data', {})
+    return data.get('order') or {}
+
+
 def cmd_orders_fos(args) -> int:
     load_agents_env(args.env)
     if not args.order_id and not args.order_name:
         raise SystemExit('--order-id or --order-name is required')
-    if args.order_name:
-        # find by name
-        q = f"""
-        query {{
-          orders(first: 1, query: {json.dumps('name:'+args.order_name)}) {{
-            edges {{ node {{ id name fulfillmentOrders(first: 50) {{ edges {{ node {{ id status requestStatus }} }} }} }} }}
-          }}
-        }}
-        """
-        data = graphql(q).get('data', {})
-        edges = (((data.get('orders') or {}).get('edges')) or [])
-        if not edges:
-            print(json.dumps({'orders': []}, indent=2))
-            return 0
-        order = edges[0]['node']
-    else:
-        q = """
-        query($id: ID!) {
-          order(id: $id) { id name fulfillmentOrders(first: 50) { edges { node { id status requestStatus } } } }
-        }
-        """
-        data = graphql(q, {"id": args.order_id}).get('data', {})
-        order = data.get('order') or {}
+    order = fetch_order_fulfillment_orders(args.order_id, args.order_name)
+    if order is None:
+        print_json({'orders': []})
+        return 0
     fos = [e['node'] for e in (((order.get('fulfillmentOrders') or {}).get('edges')) or [])]
-    print(json.dumps({'order': {'id': order.get('id'), 'name': order.get('name')}, 'fulfillmentOrders': fos}, indent=2))
+    print_json({'order': {'id': order.get('id'), 'name': order.get('name')}, 'fulfillmentOrders': fos})
     return 0
 
 
+FULFILLMENT_DEADLINE_MUTATION = """
+mutation($ids: [ID!]!, $deadline: DateTime!) {
+  fulfillmentOrdersSetFulfillmentDeadline(fulfillmentOrderIds: $ids, fulfillmentDeadline: $deadline) {
+    userErrors { field message }
+  }
+}
+"""
+
+
 def cmd_orders_set_deadline(args) -> int:
     load_agents_env(args.env)
     if not args.fo_id and not args.order_id and not args.order_name:
@@ -691,49 +775,33 @@ def cmd_orders_set_deadline(args) -> int:
     if args.fo_id:
         fo_ids = [args.fo_id]
     else:
-        # fetch FOs from order
-        holder = argparse.Namespace(order_id=args.order_id, order_name=args.order_name)
-        # reuse logic
-        if args.order_name:
-            q = f"""
-            query {{
-              orders(first: 1, query: {json.dumps('name:'+args.order_name)}) {{
-                edges {{ node {{ id name fulfillmentOrders(first: 50) {{ edges {{ node {{ id }} }} }} }} }}
-              }}
-            }}
-            """
-            data = graphql(q).get('data', {})
-            edges = (((data.get('orders') or {}).get('edges')) or [])
-            if not edges:
-                raise SystemExit('Order not found by name')
-            order = edges[0]['node']
-        else:
-            q = """
-            query($id: ID!) { order(id: $id) { id fulfillmentOrders(first: 50) { edges { node { id } } } } }
-            """
-            data = graphql(q, {"id": args.order_id}).get('data', {})
-            order = data.get('order') or {}
+        order = fetch_order_fulfillment_orders(args.order_id, args.order_name)
+        if order is None:
+            raise SystemExit('Order not found by name')
         fo_ids = [e['node']['id'] for e in (((order.get('fulfillmentOrders') or {}).get('edges')) or [])]
         if not fo_ids:
             raise SystemExit('No fulfillment orders found for order')
         if not args.all:
             fo_ids = fo_ids[:1]
-    mutation = """
-    mutation($ids: [ID!]!, $deadline: DateTime!) {
-      fulfillmentOrdersSetFulfillmentDeadline(fulfillmentOrderIds: $ids, fulfillmentDeadline: $deadline) {
-        userErrors { field message }
-      }
-    }
-    """
     vars_obj = {"ids": fo_ids, "deadline": args.deadline}
     if args.dry_run:
-        print(json.dumps({"dry_run": True, "mutation": mutation, "variables": vars_obj}, indent=2))
+        print_json({"dry_run": True, "mutation": FULFILLMENT_DEADLINE_MUTATION, "variables": vars_obj})
         return 0
-    data = graphql(mutation, vars_obj).get('data', {})
-    print(json.dumps(data, indent=2))
+    data = graphql(FULFILLMENT_DEADLINE_MUTATION, vars_obj).get('data', {})
+    print_json(data)
     return 0
 
 
+ARTICLE_CREATE_MUTATION = """
+mutation($article: ArticleCreateInput!) {
+  articleCreate(article: $article) {
+    article { id handle title blog { id handle } }
+    userErrors { field message }
+  }
+}
+"""
+
+
 def cmd_articles_create(args) -> int:
     load_agents_env(args.env)
     # Build ArticleCreateInput
@@ -748,10 +816,10 @@ def cmd_articles_create(args) -> int:
     if args.handle:
         article["handle"] = args.handle
     if args.body or args.body_file:
-        body = args.body or open(os.path.expanduser(args.body_file), 'r', encoding='utf-8').read()
+        body = args.body or read_text_file(args.body_file)
         article["body"] = body
     if args.summary or args.summary_file:
-        summary = args.summary or open(os.path.expanduser(args.summary_file), 'r', encoding='utf-8').read()
+        summary = args.summary or read_text_file(args.summary_file)
         article["summary"] = summary
     if args.tags:
         article["tags"] = [t.strip() for t in args.tags.split(',') if t.strip()]
@@ -762,23 +830,25 @@ def cmd_articles_create(args) -> int:
     if args.template_suffix is not None:
         article["templateSuffix"] = args.template_suffix
 
-    mutation = """
-    mutation($article: ArticleCreateInput!) {
-      articleCreate(article: $article) {
-        article { id handle title blog { id handle } }
-        userErrors { field message }
-      }
-    }
-    """
     variables = {"article": article}
     if args.dry_run:
-        print(json.dumps({"dry_run": True, "mutation": mutation, "variables": variables}, indent=2))
+        print_json({"dry_run": True, "mutation": ARTICLE_CREATE_MUTATION, "variables": variables})
         return 0
-    data = graphql(mutation, variables).get('data', {})
-    print(json.dumps(data, indent=2))
+    data = graphql(ARTICLE_CREATE_MUTATION, variables).get('data', {})
+    print_json(data)
     return 0
 
 
+ARTICLE_UPDATE_MUTATION = """
+mutation($id: ID!, $article: ArticleUpdateInput!) {
+  articleUpdate(id: $id, article: $article) {
+    article { id handle title blog { id handle } }
+    userErrors { field message }
+  }
+}
+"""
+
+
 def cmd_articles_update(args) -> int:
     load_agents_env(args.env)
     aid = args.id
@@ -792,10 +862,10 @@ def cmd_articles_update(args) -> int:
     if args.handle is not None and args.update_handle:
         article["handle"] = args.handle
     if args.body or args.body_file:
-        body = args.body or open(os.path.expanduser(args.body_file), 'r', encoding='utf-8').read()
+        body = args.body or read_text_file(args.body_file)
         article["body"] = body
     if args.summary or args.summary_file:
-        summary = args.summary or open(os.path.expanduser(args.summary_file), 'r', encoding='utf-8').read()
+        summary = args.summary or read_text_file(args.summary_file)
         article["summary"] = summary
     if args.tags is not None:
         article["tags"] = [t.strip() for t in args.tags.split(',')] if args.tags else []
@@ -806,23 +876,25 @@ def cmd_articles_update(args) -> int:
     if args.template_suffix is not None:
         article["templateSuffix"] = args.template_suffix
 
-    mutation = """
-    mutation($id: ID!, $article: ArticleUpdateInput!) {
-      articleUpdate(id: $id, article: $article) {
-        article { id handle title blog { id handle } }
-        userErrors { field message }
-      }
-    }
-    """
     variables = {"id": aid, "article": article}
     if args.dry_run:
-        print(json.dumps({"dry_run": True, "mutation": mutation, "variables": variables}, indent=2))
+        print_json({"dry_run": True, "mutation": ARTICLE_UPDATE_MUTATION, "variables": variables})
         return 0
-    data = graphql(mutation, variables).get('data', {})
-    print(json.dumps(data, indent=2))
+    data = graphql(ARTICLE_UPDATE_MUTATION, variables).get('data', {})
+    print_json(data)
     return 0
 
 
+BLOG_CREATE_MUTATION = """
+mutation($blog: BlogCreateInput!) {
+  blogCreate(blog: $blog) {
+    blog { id handle title }
+    userErrors { field message }
+  }
+}
+"""
+
+
 def cmd_blogs_create(args) -> int:
     load_agents_env(args.env)
     blog: Dict[str, Any] = {"title": args.title}
@@ -832,29 +904,28 @@ def cmd_blogs_create(args) -> int:
         blog["templateSuffix"] = args.template_suffix
     if args.comment_policy is not None:
         blog["commentPolicy"] = args.comment_policy
-    mutation = """
-    mutation($blog: BlogCreateInput!) {
-      blogCreate(blog: $blog) {
-        blog { id handle title }
-        userErrors { field message }
-      }
-    }
-    """
     variables = {"blog": blog}
     if args.dry_run:
-        print(json.dumps({"dry_run": True, "mutation": mutation, "variables": variables}, indent=2))
+        print_json({"dry_run": True, "mutation": BLOG_CREATE_MUTATION, "variables": variables})
         return 0
-    data = graphql(mutation, variables).get('data', {})
-    print(json.dumps(data, indent=2))
+    data = graphql(BLOG_CREATE_MUTATION, variables).get('data', {})
+    print_json(data)
     return 0
 
 
+BLOG_UPDATE_MUTATION = """
+mutation($id: ID!, $blog: BlogUpdateInput!) {
+  blogUpdate(id: $id, blog: $blog) {
+    blog { id handle title }
+    userErrors { field message }
+  }
+}
+"""
+
+
 def cmd_blogs_update(args) -> int:
     load_agents_env(args.env)
-    bid = args.id
-    if not bid and args.handle:
-        bid = resolve_blog_id_by_handle(args.handle)
-    if not bid:
+    if not args.id and not args.handle:
         raise SystemExit('Blog id is required (or resolvable via --handle)')
     blog: Dict[str, Any] = {}
     if args.title is not None:
@@ -867,23 +938,36 @@ def cmd_blogs_update(args) -> int:
         blog["commentPolicy"] = args.comment_policy
     if args.redirect_new_handle is not None:
         blog["redirectNewHandle"] = bool(args.redirect_new_handle)
-    mutation = """
-    mutation($id: ID!, $blog: BlogUpdateInput!) {
-      blogUpdate(id: $id, blog: $blog) {
-        blog { id handle title }
-        userErrors { field message }
-      }
-    }
-    """
+    if not blog:
+        # Nothing to change: skip the handle lookup and the mutation round trip
+        print_json({"skipped": True, "reason": "no changes", "id": args.id, "handle": args.handle})
+        return 0
+    bid = args.id or resolve_blog_id_by_handle(args.handle)
+    if not bid:
+        raise SystemExit('Blog id is required (or resolvable via --handle)')
     variables = {"id": bid, "blog": blog}
     if args.dry_run:
-        print(json.dumps({"dry_run": True, "mutation": mutation, "variables": variables}, indent=2))
+        print_json({"dry_run": True, "mutation": BLOG_UPDATE_MUTATION, "variables": variables})
         return 0
-    data = graphql(mutation, variables).get('data', {})
-    print(json.dumps(data, indent=2))
+    data = graphql(BLOG_UPDATE_MUTATION, variables).get('data', {})
+    print_json(data)
     return 0
 
 
+# One pass over --products: each match is an id, commas and whitespace are separators
+_PRODUCT_ID_RE = re.compile(r'[^,\s]+')
+
+
+COLLECTION_CREATE_MUTATION = """
+mutation($input: CollectionInput!) {
+  collectionCreate(input: $input) {
+    collection { id handle title }
+    userErrors { field message }
+  }
+}
+"""
+
+
 def cmd_collections_create(args) -> int:
     load_agents_env(args.env)
     input_obj: Dict[str, Any] = {"title": args.title}
@@ -896,41 +980,33 @@ def cmd_collections_create(args) -> int:
     if args.sort_order is not None:
         input_obj["sortOrder"] = args.sort_order
     if args.products:
-        ids = [s.strip() for s in args.products.split(',') if s.strip()]
-        input_obj["products"] = ids
+        input_obj["products"] = _PRODUCT_ID_RE.findall(args.products)
     if args.rule_set_json:
-        # Accept inline JSON or file path
-        val = args.rule_set_json
-        p = os.path.expanduser(val)
-        if os.path.exists(p):
-            input_obj["ruleSet"] = json.load(open(p, 'r', encoding='utf-8'))
-        else:
-            input_obj["ruleSet"] = json.loads(val)
-    mutation = """
-    mutation($input: CollectionInput!) {
-      collectionCreate(input: $input) {
-        collection { id handle title }
-        userErrors { field message }
-      }
-    }
-    """
+        input_obj["ruleSet"] = load_json_arg(args.rule_set_json)
     variables = {"input": input_obj}
     if args.dry_run:
-        print(json.dumps({"dry_run": True, "mutation": mutation, "variables": variables}, indent=2))
+        print_json({"dry_run": True, "mutation": COLLECTION_CREATE_MUTATION, "variables": variables})
         return 0
-    data = graphql(mutation, variables).get('data', {})
-    print(json.dumps(data, indent=2))
+    data = graphql(COLLECTION_CREATE_MUTATION, variables).get('data', {})
+    print_json(data)
     return 0
 
 
+COLLECTION_UPDATE_MUTATION = """
+mutation($input: CollectionInput!) {
+  collectionUpdate(input: $input) {
+    collection { id handle title }
+    userErrors { field message }
+  }
+}
+"""
+
+
 def cmd_collections_update(args) -> int:
     load_agents_env(args.env)
-    cid = args.id
-    if not cid and args.handle:
-        cid = resolve_collection_id_by_handle(args.handle)
-    if not cid:
+    if not args.id and not args.handle:
         raise SystemExit('Collection id required (or resolvable via --handle)')
-    input_obj: Dict[str, Any] = {"id": cid}
+    input_obj: Dict[str, Any] = {}
     if args.new_title is not None:
         input_obj["title"] = args.new_title
     if args.new_handle is not None:
@@ -942,56 +1018,70 @@ def cmd_collections_update(args) -> int:
     if args.sort_order is not None:
         input_obj["sortOrder"] = args.sort_order
     if args.products is not None:
-        ids = [s.strip() for s in args.products.split(',')] if args.products else []
-        input_obj["products"] = ids
+        input_obj["products"] = _PRODUCT_ID_RE.findall(args.products)
     # Image support via public URL
-    if getattr(args, 'image_src', None):
+    if args.image_src:
         img = {"src": args.image_src}
-        if getattr(args, 'image_alt', None):
+        if args.image_alt:
             img["altText"] = args.image_alt
         input_obj["image"] = img
     if args.rule_set_json:
-        p = os.path.expanduser(args.rule_set_json)
-        if os.path.exists(p):
-            input_obj["ruleSet"] = json.load(open(p, 'r', encoding='utf-8'))
-        else:
-            input_obj["ruleSet"] = json.loads(args.rule_set_json)
+        input_obj["ruleSet"] = load_json_arg(args.rule_set_json)
     if args.redirect_new_handle is not None:
         input_obj["redirectNewHandle"] = bool(args.redirect_new_handle)
-    mutation = """
-    mutation($input: CollectionInput!) {
-      collectionUpdate(input: $input) {
-        collection { id handle title }
-        userErrors { field message }
-      }
-    }
-    """
+    if not input_obj:
+        # Nothing to change: skip the handle lookup and the mutation round trip
+        print_json({"skipped": True, "reason": "no changes", "id": args.id, "handle": args.handle})
+        return 0
+    cid = args.id or resolve_collection_id_by_handle(args.handle)
+    if not cid:
+        raise SystemExit('Collection id required (or resolvable via --handle)')
+    input_obj = {"id": cid, **input_obj}
     variables = {"input": input_obj}
     if args.dry_run:
-        print(json.dumps({"dry_run": True, "mutation": mutation, "variables": variables}, indent=2))
+        print_json({"dry_run": True, "mutation": COLLECTION_UPDATE_MUTATION, "variables": variables})
         return 0
-    data = graphql(mutation, variables).get('data', {})
-    print(json.dumps(data, indent=2))
+    data = graphql(COLLECTION_UPDATE_MUTATION, variables).get('data', {})
+    print_json(data)
     return 0
 
 
-def build_parser() -> argparse.ArgumentParser:
-    p = argparse.ArgumentParser(description='Shopify Admin GraphQL Ops')
-    p.add_argument('--env', help='Path to AGENTS.env (default ~/AGENTS.env)')
-    sp = p.add_subparsers(dest='cmd', required=True)
+# Enum values shared by several subcommands' --sort-order / --comment-policy flags
+COLLECTION_SORT_ORDERS = ('MANUAL', 'BEST_SELLING', 'ALPHA_ASC', 'ALPHA_DESC', 'PRICE_ASC', 'PRICE_DESC', 'CREATED_ASC', 'CREATED_DESC')
+BLOG_COMMENT_POLICIES = ('NO_COMMENTS', 'MODERATE_COMMENTS', 'ALLOW_COMMENTS')
+
+
+def positive_int(value: str) -> int:
+    n = int(value)
+    if n < 1:
+        raise argparse.ArgumentTypeError(f'must be a positive integer, got {value}')
+    return n
+
+
+def _add_leaves(ssp, leaves: Dict[str, Any], leaf: Optional[str]) -> None:
+    # Register only the invoked subcommand; help and unknown names get every one
+    if leaf in leaves:
+        leaves[leaf](ssp)
+    else:
+        for add_parser in leaves.values():
+            add_parser(ssp)
+
 
+def _add_auth_parser(sp, leaf: Optional[str] = None) -> None:
     pa = sp.add_parser('auth', help='Auth check: shop { name, myshopifyDomain }')
     pa.set_defaults(func=cmd_auth)
 
+
+def _add_query_parser(sp, leaf: Optional[str] = None) -> None:
     pq = sp.add_parser('query', help='Run an arbitrary GraphQL query/mutation')
     pq.add_argument('--file', help='Path to .graphql file')
     pq.add_argument('--query', help='Inline query string')
     pq.add_argument('--variables', help='JSON string or path to JSON file')
     pq.set_defaults(func=cmd_query)
 
-    pprod = sp.add_parser('products', help='Product operations')
-    spr = pprod.add_subparsers(dest='prod_cmd', required=True)
-    ppl = spr.add_parser('list', help='List/search products')
+
+def _add_products_list_parser(ssp) -> None:
+    ppl = ssp.add_parser('list', help='List/search products')
     ppl.add_argument('--query', help='Search query (Shopify search syntax)')
     ppl.add_argument('--page-size', default='100')
     ppl.add_argument('--limit', default='100')
@@ -999,11 +1089,20 @@ def build_parser() -> argparse.ArgumentParser:
     ppl.add_argument('--jsonl', help='Write JSONL to path (default stdout)')
     ppl.add_argument('--csv', help='Write CSV to path')
     ppl.add_argument('--fields', help='CSV fields (comma-separated)')
+    ppl.add_argument('--bulk', action='store_true', help='Export via Bulk Operations (implies --all; ignores --limit/--page-size)')
     ppl.set_defaults(func=cmd_products_list)
 
-    pcus = sp.add_parser('customers', help='Customer operations')
-    sc = pcus.add_subparsers(dest='cus_cmd', required=True)
-    pcl = sc.add_parser('list', help='List/search customers')
+
+def _add_products_parser(sp, leaf: Optional[str] = None) -> None:
+    pprod = sp.add_parser('products', help='Product operations')
+    spr = pprod.add_subparsers(dest='prod_cmd', required=True)
+    _add_leaves(spr, {
+        'list': _add_products_list_parser,
+    }, leaf)
+
+
+def _add_customers_list_parser(ssp) -> None:
+    pcl = ssp.add_parser('list', help='List/search customers')
     pcl.add_argument('--query', help='Search query')
     pcl.add_argument('--page-size', default='100')
     pcl.add_argument('--limit', default='100')
@@ -1011,11 +1110,20 @@ def build_parser() -> argparse.ArgumentParser:
     pcl.add_argument('--jsonl', help='Write JSONL to path (default stdout)')
     pcl.add_argument('--csv', help='Write CSV to path')
     pcl.add_argument('--fields', help='CSV fields (comma-separated)')
+    pcl.add_argument('--bulk', action='store_true', help='Export via Bulk Operations (implies --all; ignores --limit/--page-size)')
     pcl.set_defaults(func=cmd_customers_list)
 
-    pord = sp.add_parser('orders', help='Order operations')
-    so = pord.add_subparsers(dest='ord_cmd', required=True)
-    pol = so.add_parser('list', help='List/search orders')
+
+def _add_customers_parser(sp, leaf: Optional[str] = None) -> None:
+    pcus = sp.add_parser('customers', help='Customer operations')
+    sc = pcus.add_subparsers(dest='cus_cmd', required=True)
+    _add_leaves(sc, {
+        'list': _add_customers_list_parser,
+    }, leaf)
+
+
+def _add_orders_list_parser(ssp) -> None:
+    pol = ssp.add_parser('list', help='List/search orders')
     pol.add_argument('--query', help='Search query')
     pol.add_argument('--page-size', default='100')
     pol.add_argument('--limit', default='100')
@@ -1023,14 +1131,19 @@ def build_parser() -> argparse.ArgumentParser:
     pol.add_argument('--jsonl', help='Write JSONL to path (default stdout)')
     pol.add_argument('--csv', help='Write CSV to path')
     pol.add_argument('--fields', help='CSV fields (comma-separated)')
+    pol.add_argument('--bulk', action='store_true', help='Export via Bulk Operations (implies --all; ignores --limit/--page-size)')
     pol.set_defaults(func=cmd_orders_list)
 
-    pfo = so.add_parser('fulfillment-orders', help='List fulfillment orders for an order')
+
+def _add_orders_fulfillment_orders_parser(ssp) -> None:
+    pfo = ssp.add_parser('fulfillment-orders', help='List fulfillment orders for an order')
     pfo.add_argument('--order-id', help='Order GID')
     pfo.add_argument('--order-name', help='Order name, e.g., #1001')
     pfo.set_defaults(func=cmd_orders_fos)
 
-    psd = so.add_parser('set-fulfillment-deadline', help='Set fulfillment deadline for one/more fulfillment orders')
+
+def _add_orders_set_fulfillment_deadline_parser(ssp) -> None:
+    psd = ssp.add_parser('set-fulfillment-deadline', help='Set fulfillment deadline for one/more fulfillment orders')
     psd.add_argument('--fo-id', help='FulfillmentOrder GID')
     psd.add_argument('--order-id', help='Order GID (sets all FOs unless --all omitted)')
     psd.add_argument('--order-name', help='Order name (sets FOs unless --all omitted)')
@@ -1039,14 +1152,27 @@ def build_parser() -> argparse.ArgumentParser:
     psd.add_argument('--dry-run', action='store_true')
     psd.set_defaults(func=cmd_orders_set_deadline)
 
-    pmf = sp.add_parser('metafield', help='Metafield operations')
-    smf = pmf.add_subparsers(dest='mf_cmd', required=True)
-    pmfg = smf.add_parser('get', help='Get a metafield by ownerId/ns/key')
+
+def _add_orders_parser(sp, leaf: Optional[str] = None) -> None:
+    pord = sp.add_parser('orders', help='Order operations')
+    so = pord.add_subparsers(dest='ord_cmd', required=True)
+    _add_leaves(so, {
+        'list': _add_orders_list_parser,
+        'fulfillment-orders': _add_orders_fulfillment_orders_parser,
+        'set-fulfillment-deadline': _add_orders_set_fulfillment_deadline_parser,
+    }, leaf)
+
+
+def _add_metafield_get_parser(ssp) -> None:
+    pmfg = ssp.add_parser('get', help='Get a metafield by ownerId/ns/key')
     pmfg.add_argument('--owner-id', required=True)
     pmfg.add_argument('--ns', required=True)
     pmfg.add_argument('--key', required=True)
     pmfg.set_defaults(func=cmd_metafield_get)
-    pmfs = smf.add_parser('set', help='Set/update a metafield (dry-run aware)')
+
+
+def _add_metafield_set_parser(ssp) -> None:
+    pmfs = ssp.add_parser('set', help='Set/update a metafield (dry-run aware)')
     pmfs.add_argument('--owner-id', required=True)
     pmfs.add_argument('--ns', required=True)
     pmfs.add_argument('--key', required=True)
@@ -1055,10 +1181,18 @@ def build_parser() -> argparse.ArgumentParser:
     pmfs.add_argument('--dry-run', action='store_true')
     pmfs.set_defaults(func=cmd_metafield_set)
 
-    # Pages
-    ppage = sp.add_parser('pages', help='Online Store pages operations')
-    spp = ppage.add_subparsers(dest='page_cmd', required=True)
-    ppl = spp.add_parser('list', help='List/search pages')
+
+def _add_metafield_parser(sp, leaf: Optional[str] = None) -> None:
+    pmf = sp.add_parser('metafield', help='Metafield operations')
+    smf = pmf.add_subparsers(dest='mf_cmd', required=True)
+    _add_leaves(smf, {
+        'get': _add_metafield_get_parser,
+        'set': _add_metafield_set_parser,
+    }, leaf)
+
+
+def _add_pages_list_parser(ssp) -> None:
+    ppl = ssp.add_parser('list', help='List/search pages')
     ppl.add_argument('--query', help='Search query')
     ppl.add_argument('--page-size', default='100')
     ppl.add_argument('--limit', default='100')
@@ -1068,10 +1202,17 @@ def build_parser() -> argparse.ArgumentParser:
     ppl.add_argument('--fields', help='CSV fields (comma-separated)')
     ppl.set_defaults(func=cmd_pages_list)
 
-    # Blogs and Articles
-    pblog = sp.add_parser('blogs', help='Blog operations')
-    sbl = pblog.add_subparsers(dest='blog_cmd', required=True)
-    bll = sbl.add_parser('list', help='List/search blogs')
+
+def _add_pages_parser(sp, leaf: Optional[str] = None) -> None:
+    ppage = sp.add_parser('pages', help='Online Store pages operations')
+    spp = ppage.add_subparsers(dest='page_cmd', required=True)
+    _add_leaves(spp, {
+        'list': _add_pages_list_parser,
+    }, leaf)
+
+
+def _add_blogs_list_parser(ssp) -> None:
+    bll = ssp.add_parser('list', help='List/search blogs')
     bll.add_argument('--query', help='Search query')
     bll.add_argument('--page-size', default='100')
     bll.add_argument('--limit', default='100')
@@ -1081,54 +1222,55 @@ def build_parser() -> argparse.ArgumentParser:
     bll.add_argument('--fields', help='CSV fields (comma-separated)')
     bll.set_defaults(func=cmd_blogs_list)
 
-    part = sp.add_parser('articles', help='Article operations')
-    sar = part.add_subparsers(dest='art_cmd', required=True)
-    arl = sar.add_parser('list', help='List/search articles (optionally scoped to a blog)')
-    arl.add_argument('--query', help='Search query')
-    arl.add_argument('--blog-id', help='Scope to a specific Blog GID')
-    arl.add_argument('--page-size', default='100')
-    arl.add_argument('--limit', default='100')
-    arl.add_argument('--all', action='store_true')
-    arl.add_argument('--jsonl', help='Write JSONL to path (default stdout)')
-    arl.add_argument('--csv', help='Write CSV to path')
-    arl.add_argument('--fields', help='CSV fields (comma-separated)')
-    arl.set_defaults(func=cmd_articles_list)
 
-    # Collections
-    pcol = sp.add_parser('collections', help='Collection operations')
-    scoll = pcol.add_subparsers(dest='col_cmd', required=True)
-    cl = scoll.add_parser('list', help='List/search collections')
-    cl.add_argument('--query', help='Search query')
-    cl.add_argument('--page-size', default='100')
-    cl.add_argument('--limit', default='100')
-    cl.add_argument('--all', action='store_true')
-    cl.add_argument('--jsonl', help='Write JSONL to path (default stdout)')
-    cl.add_argument('--csv', help='Write CSV to path')
-    cl.add_argument('--fields', help='CSV fields (comma-separated)')
-    cl.set_defaults(func=cmd_collections_list)
-
-    # Blogs create/update
-    blc = sbl.add_parser('create', help='Create a blog')
+def _add_blogs_create_parser(ssp) -> None:
+    blc = ssp.add_parser('create', help='Create a blog')
     blc.add_argument('--title', required=True)
     blc.add_argument('--handle')
     blc.add_argument('--template-suffix')
-    blc.add_argument('--comment-policy', choices=['NO_COMMENTS', 'MODERATE_COMMENTS', 'ALLOW_COMMENTS'])
+    blc.add_argument('--comment-policy', choices=BLOG_COMMENT_POLICIES)
     blc.add_argument('--dry-run', action='store_true')
     blc.set_defaults(func=cmd_blogs_create)
 
-    blu = sbl.add_parser('update', help='Update a blog')
+
+def _add_blogs_update_parser(ssp) -> None:
+    blu = ssp.add_parser('update', help='Update a blog')
     blu.add_argument('--id')
     blu.add_argument('--handle', help='Existing handle to resolve id')
     blu.add_argument('--title')
     blu.add_argument('--new-handle')
     blu.add_argument('--template-suffix')
-    blu.add_argument('--comment-policy', choices=['NO_COMMENTS', 'MODERATE_COMMENTS', 'ALLOW_COMMENTS'])
+    blu.add_argument('--comment-policy', choices=BLOG_COMMENT_POLICIES)
     blu.add_argument('--redirect-new-handle', type=int, choices=[0,1])
     blu.add_argument('--dry-run', action='store_true')
     blu.set_defaults(func=cmd_blogs_update)
 
-    # Articles create/update
-    arc = sar.add_parser('create', help='Create an article')
+
+def _add_blogs_parser(sp, leaf: Optional[str] = None) -> None:
+    pblog = sp.add_parser('blogs', help='Blog operations')
+    sbl = pblog.add_subparsers(dest='blog_cmd', required=True)
+    _add_leaves(sbl, {
+        'list': _add_blogs_list_parser,
+        'create': _add_blogs_create_parser,
+        'update': _add_blogs_update_parser,
+    }, leaf)
+
+
+def _add_articles_list_parser(ssp) -> None:
+    arl = ssp.add_parser('list', help='List/search articles (optionally scoped to a blog)')
+    arl.add_argument('--query', help='Search query')
+    arl.add_argument('--blog-id', help='Scope to a specific Blog GID')
+    arl.add_argument('--page-size', default='100')
+    arl.add_argument('--limit', default='100')
+    arl.add_argument('--all', action='store_true')
+    arl.add_argument('--jsonl', help='Write JSONL to path (default stdout)')
+    arl.add_argument('--csv', help='Write CSV to path')
+    arl.add_argument('--fields', help='CSV fields (comma-separated)')
+    arl.set_defaults(func=cmd_articles_list)
+
+
+def _add_articles_create_parser(ssp) -> None:
+    arc = ssp.add_parser('create', help='Create an article')
     arc.add_argument('--title', required=True)
     arc.add_argument('--blog-id')
     arc.add_argument('--blog-handle')
@@ -1144,7 +1286,9 @@ def build_parser() -> argparse.ArgumentParser:
     arc.add_argument('--dry-run', action='store_true')
     arc.set_defaults(func=cmd_articles_create)
 
-    aru = sar.add_parser('update', help='Update an article')
+
+def _add_articles_update_parser(ssp) -> None:
+    aru = ssp.add_parser('update', help='Update an article')
     aru.add_argument('--id')
     aru.add_argument('--blog-id')
     aru.add_argument('--blog-handle')
@@ -1162,26 +1306,51 @@ def build_parser() -> argparse.ArgumentParser:
     aru.add_argument('--dry-run', action='store_true')
     aru.set_defaults(func=cmd_articles_update)
 
-    # Collections create/update
-    cc = scoll.add_parser('create', help='Create a collection')
+
+def _add_articles_parser(sp, leaf: Optional[str] = None) -> None:
+    part = sp.add_parser('articles', help='Article operations')
+    sar = part.add_subparsers(dest='art_cmd', required=True)
+    _add_leaves(sar, {
+        'list': _add_articles_list_parser,
+        'create': _add_articles_create_parser,
+        'update': _add_articles_update_parser,
+    }, leaf)
+
+
+def _add_collections_list_parser(ssp) -> None:
+    cl = ssp.add_parser('list', help='List/search collections')
+    cl.add_argument('--query', help='Search query')
+    cl.add_argument('--page-size', default='100')
+    cl.add_argument('--limit', default='100')
+    cl.add_argument('--all', action='store_true')
+    cl.add_argument('--jsonl', help='Write JSONL to path (default stdout)')
+    cl.add_argument('--csv', help='Write CSV to path')
+    cl.add_argument('--fields', help='CSV fields (comma-separated)')
+    cl.set_defaults(func=cmd_collections_list)
+
+
+def _add_collections_create_parser(ssp) -> None:
+    cc = ssp.add_parser('create', help='Create a collection')
     cc.add_argument('--title', required=True)
     cc.add_argument('--handle')
     cc.add_argument('--description-html')
     cc.add_argument('--template-suffix')
-    cc.add_argument('--sort-order', choices=['MANUAL','BEST_SELLING','ALPHA_ASC','ALPHA_DESC','PRICE_ASC','PRICE_DESC','CREATED_ASC','CREATED_DESC'])
+    cc.add_argument('--sort-order', choices=COLLECTION_SORT_ORDERS)
     cc.add_argument('--products', help='Comma-separated product GIDs to include')
     cc.add_argument('--rule-set-json', help='Inline JSON or file path for CollectionRuleSetInput')
     cc.add_argument('--dry-run', action='store_true')
     cc.set_defaults(func=cmd_collections_create)
 
-    cu = scoll.add_parser('update', help='Update a collection')
+
+def _add_collections_update_parser(ssp) -> None:
+    cu = ssp.add_parser('update', help='Update a collection')
     cu.add_argument('--id')
     cu.add_argument('--handle', help='Existing handle to resolve id')
     cu.add_argument('--new-title')
     cu.add_argument('--new-handle')
     cu.add_argument('--description-html')
     cu.add_argument('--template-suffix')
-    cu.add_argument('--sort-order', choices=['MANUAL','BEST_SELLING','ALPHA_ASC','ALPHA_DESC','PRICE_ASC','PRICE_DESC','CREATED_ASC','CREATED_DESC'])
+    cu.add_argument('--sort-order', choices=COLLECTION_SORT_ORDERS)
     cu.add_argument('--products', help='Comma-separated product GIDs to set (overwrites order)')
     cu.add_argument('--rule-set-json', help='Inline JSON or file path for CollectionRuleSetInput')
     cu.add_argument('--redirect-new-handle', type=int, choices=[0,1])
@@ -1190,27 +1359,100 @@ def build_parser() -> argparse.ArgumentParser:
     cu.add_argument('--dry-run', action='store_true')
     cu.set_defaults(func=cmd_collections_update)
 
-    # Vendors tooling
-    pven = sp.add_parser('vendors', help='Vendor utilities')
-    sv = pven.add_subparsers(dest='ven_cmd', required=True)
-    vlist = sv.add_parser('list', help='List distinct product vendors')
+
+def _add_collections_parser(sp, leaf: Optional[str] = None) -> None:
+    pcol = sp.add_parser('collections', help='Collection operations')
+    scoll = pcol.add_subparsers(dest='col_cmd', required=True)
+    _add_leaves(scoll, {
+        'list': _add_collections_list_parser,
+        'create': _add_collections_create_parser,
+        'update': _add_collections_update_parser,
+    }, leaf)
+
+
+def _add_vendors_list_parser(ssp) -> None:
+    vlist = ssp.add_parser('list', help='List distinct product vendors')
     vlist.add_argument('--json', action='store_true')
     vlist.set_defaults(func=cmd_vendors_list)
-    venc = sv.add_parser('ensure-collections', help='Ensure a collection exists for each vendor (smart collection: vendor == name)')
+
+
+def _add_vendors_ensure_collections_parser(ssp) -> None:
+    venc = ssp.add_parser('ensure-collections', help='Ensure a collection exists for each vendor (smart collection: vendor == name)')
     venc.add_argument('--exclude', help='Comma-separated vendor names to exclude (case-insensitive)')
-    venc.add_argument('--sort-order', default='BEST_SELLING', choices=['MANUAL','BEST_SELLING','ALPHA_ASC','ALPHA_DESC','PRICE_ASC','PRICE_DESC','CREATED_ASC','CREATED_DESC'])
+    venc.add_argument('--sort-order', default='BEST_SELLING', choices=COLLECTION_SORT_ORDERS)
     venc.add_argument('--template-suffix', default='')
     venc.add_argument('--rename', action='append', help='Rename mapping old=new (repeatable)')
     venc.add_argument('--apply', action='store_true', help='Apply changes (otherwise prints dry-run)')
     venc.add_argument('--full', action='store_true', help='Include full plan in dry-run output')
+    venc.add_argument('--batch-size', type=positive_int, default=COLLECTION_CREATE_BATCH_SIZE, help='collectionCreate mutations per request with --apply (default 25)')
     venc.set_defaults(func=cmd_vendors_ensure_collections)
 
+
+def _add_vendors_parser(sp, leaf: Optional[str] = None) -> None:
+    pven = sp.add_parser('vendors', help='Vendor utilities')
+    sv = pven.add_subparsers(dest='ven_cmd', required=True)
+    _add_leaves(sv, {
+        'list': _add_vendors_list_parser,
+        'ensure-collections': _add_vendors_ensure_collections_parser,
+    }, leaf)
+
+
+SUBCOMMANDS = {
+    'auth': _add_auth_parser,
+    'query': _add_query_parser,
+    'products': _add_products_parser,
+    'customers': _add_customers_parser,
+    'orders': _add_orders_parser,
+    'metafield': _add_metafield_parser,
+    'pages': _add_pages_parser,
+    'blogs': _add_blogs_parser,
+    'articles': _add_articles_parser,
+    'collections': _add_collections_parser,
+    'vendors': _add_vendors_parser,
+}
+
+
+def _peek_command(argv: List[str]) -> List[str]:
+    # Leading positional tokens (command, subcommand), skipping the top-level --env value;
+    # empty for help/no command
+    tokens = iter(argv)
+    words: List[str] = []
+    for tok in tokens:
+        if tok in ('-h', '--help'):
+            return []
+        if tok == '--env' and not words:
+            next(tokens, None)
+            continue
+        if tok.startswith('-'):
+            continue
+        words.append(tok)
+        if len(words) == 2:
+            break
+    return words
+
+
+def build_parser(argv: Optional[List[str]] = None) -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description='Shopify Admin GraphQL Ops')
+    p.add_argument('--env', help='Path to AGENTS.env (default ~/AGENTS.env)')
+    sp = p.add_subparsers(dest='cmd', required=True)
+    # Only register the (sub)command being run; help and unknown commands get the full tree
+    words = _peek_command(argv) if argv is not None else []
+    cmd = words[0] if words else None
+    if cmd in SUBCOMMANDS:
+        SUBCOMMANDS[cmd](sp, words[1] if len(words) > 1 else None)
+    else:
+        for add_parser in SUBCOMMANDS.values():
+            add_parser(sp)
     return p
 
 
 def main(argv: Optional[List[str]] = None) -> int:
-    parser = build_parser()
-    args = parser.parse_args(argv)
+    if argv is None:
+        argv = sys.argv[1:]
+    args, extras = build_parser(argv).parse_known_args(argv)
+    if extras:
+        # Let the full tree report unrecognized arguments so the usage line lists every command
+        args = build_parser().parse_args(argv)
     try:
         return args.func(args)
     except KeyboardInterrupt: